@@ -0,0 +1,281 @@
+# autosave.py
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+from data_structures import balanced_order
+
+
+class AutoSaver:
+    """Saves the catalog in the background after it changes.
+
+    The UI thread only records which exercises changed (a dict copy of the
+    exercise, or None when deleted). The saver thread keeps its own mirror of
+    the catalog, applies those changes and writes a full snapshot to a temp
+    file that then replaces the real one, so a crash never leaves a half
+    written file. Bursts of changes are combined into one write: the thread
+    waits until nothing changed for `delay` seconds (at most `max_delay`).
+
+    A failed write is retried with growing waits (up to `max_retry_delay`).
+    The error is kept in stats['last_error'] and passed to `on_error`, which
+    runs on the saver thread (a Tk app should only poll stats from the UI).
+    """
+
+    def __init__(self, path, delay=1.0, max_delay=10.0, max_retry_delay=60.0, on_error=None):
+        self.path = os.path.abspath(path)
+        self.delay = delay
+        self.max_delay = max_delay
+        self.max_retry_delay = max_retry_delay
+        self.on_error = on_error
+        self.manager = None
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._pending = {}          # lowercase name -> dict, or None if deleted
+        self._mirror = {}           # only touched by the saver thread
+        self._reset = None          # new full mirror after attach()
+        self._first_change = None
+        self._last_change = None
+        self._saving = False
+        self._retry = False         # last write failed, mirror not on disk yet
+        self._attempts = 0          # finished write attempts (ok or failed)
+        self._stopped = False
+        self._thread = None
+
+        # Measurements (seconds). hook_time is only the change hook itself;
+        # benchmark() also measures how long a save holds up the UI thread
+        self.stats = {'saves': 0, 'last_save': 0.0, 'max_save': 0.0,
+                      'hook_time': 0.0, 'max_hook_time': 0.0, 'changes': 0,
+                      'errors': 0, 'last_error': None}
+
+    def attach(self, manager):
+        # Follow a (new) manager, e.g. after loading a file
+        if self.manager is not None:
+            self.manager.remove_listener(self._on_change)
+        self.manager = manager
+        snapshot = {ex.name.lower(): ex.to_dict() for ex in manager.get_all_exercises()}
+        with self._lock:
+            self._pending = {}
+            self._reset = snapshot
+        manager.add_listener(self._on_change)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='autosave', daemon=True)
+            self._thread.start()
+
+    def _on_change(self, old_name, exercise):
+        # Called on the UI thread for every catalog change, must stay cheap
+        t0 = time.perf_counter()
+        data = exercise.to_dict() if exercise else None
+        with self._lock:
+            if exercise and old_name.lower() != exercise.name.lower():
+                self._pending[old_name.lower()] = None
+            key = exercise.name.lower() if exercise else old_name.lower()
+            self._pending[key] = data
+            now = time.monotonic()
+            if self._first_change is None:
+                self._first_change = now
+            self._last_change = now
+            self._changed.notify()
+
+        elapsed = time.perf_counter() - t0
+        self.stats['changes'] += 1
+        self.stats['hook_time'] += elapsed
+        if elapsed > self.stats['max_hook_time']:
+            self.stats['max_hook_time'] = elapsed
+
+    def _run(self):
+        failures = 0
+        while True:
+            with self._lock:
+                # Sleep until there is something to save
+                while (not self._pending and self._reset is None and not self._retry
+                       and not self._stopped):
+                    self._changed.wait()
+                if self._stopped and not self._pending and self._reset is None and not self._retry:
+                    return
+
+                # Coalesce: wait for a quiet period (or max_delay)
+                while not self._stopped and self._last_change is not None:
+                    now = time.monotonic()
+                    quiet_at = self._last_change + self.delay
+                    latest = self._first_change + self.max_delay
+                    wake = min(quiet_at, latest)
+                    if now >= wake:
+                        break
+                    self._changed.wait(wake - now)
+
+                pending, self._pending = self._pending, {}
+                reset, self._reset = self._reset, None
+                self._first_change = self._last_change = None
+                self._saving = True
+
+            # The changes go into the mirror first, so after a failed write
+            # nothing is lost: the next attempt writes the mirror again
+            error = None
+            try:
+                if reset is not None:
+                    self._mirror = reset
+                for key, data in pending.items():
+                    if data is None:
+                        self._mirror.pop(key, None)
+                    else:
+                        self._mirror[key] = data
+                self._write()
+            except Exception as e:
+                error = e
+
+            with self._lock:
+                self._saving = False
+                self._retry = error is not None
+                self._attempts += 1
+                self._changed.notify_all()
+
+            if error is None:
+                failures = 0
+                continue
+
+            failures += 1
+            self.stats['errors'] += 1
+            self.stats['last_error'] = f'{type(error).__name__}: {error}'
+            if self.on_error:
+                try:
+                    self.on_error(error)
+                except Exception:
+                    pass
+
+            # Wait before retrying: delay, 2x delay, 4x ... (flush() or stop() wake us early)
+            with self._lock:
+                if not self._stopped:
+                    self._changed.wait(min(self.delay * 2 ** failures, self.max_retry_delay))
+                if self._stopped and not self._pending:
+                    # Give up on a failing write at shutdown instead of looping
+                    return
+
+    def _write(self):
+        # Full snapshot -> temp file in the same folder -> atomic rename
+        t0 = time.perf_counter()
+        # Middle-first order, so loading the file in order builds a balanced BST
+        data = [self._mirror[key] for key in balanced_order(sorted(self._mirror))]
+        folder = os.path.dirname(self.path)
+        fd, tmp = tempfile.mkstemp(prefix='.autosave-', suffix='.json', dir=folder)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+        elapsed = time.perf_counter() - t0
+        self.stats['saves'] += 1
+        self.stats['last_save'] = elapsed
+        if elapsed > self.stats['max_save']:
+            self.stats['max_save'] = elapsed
+
+    def flush(self, timeout=None):
+        # Write pending changes now and wait for the result.
+        # Returns False if the write failed or did not finish in time.
+        if self._thread is None:
+            return False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            start = self._attempts
+            self._last_change = self._first_change = None
+            self._changed.notify_all()
+            while True:
+                idle = not (self._pending or self._reset is not None or self._saving)
+                # Done once idle, and after a retry attempt if the last write failed
+                if idle and (not self._retry or self._attempts > start):
+                    return not self._retry
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+
+    def stop(self, timeout=None):
+        # Save what is left, then end the thread; returns False if that failed
+        saved = self.flush(timeout)
+        with self._lock:
+            self._stopped = True
+            self._changed.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self.manager is not None:
+            self.manager.remove_listener(self._on_change)
+        return saved
+
+
+def _max_tick_gap(until):
+    # Stand-in for the Tk event loop: run short ticks and return the longest
+    # gap between two of them (the save thread holds the GIL in between)
+    worst = 0.0
+    last = time.perf_counter()
+    while not until():
+        sum(range(200))
+        now = time.perf_counter()
+        worst = max(worst, now - last)
+        last = now
+    return worst
+
+
+def benchmark(n=100000, edits=1000):
+    # Save latency and UI-thread cost of change tracking for a large catalog
+    from workout import WorkoutManager
+
+    m = WorkoutManager()
+    for i in range(n):
+        m.add_exercise(f'Exercise {i * 7919 % n}', 'Full Body', 3, 10, 1 + i % 60, 1 + i % 10)
+
+    # Baseline: the same edits without autosave attached
+    t0 = time.perf_counter()
+    for i in range(edits):
+        m.edit_exercise(f'Exercise {i}', duration=i % 60)
+    plain = (time.perf_counter() - t0) / edits * 1e6
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'autosave.json')
+        saver = AutoSaver(path, delay=0.05)
+        saver.attach(m)
+        saver.start()
+        saver.flush()
+
+        t0 = time.perf_counter()
+        for i in range(edits):
+            m.edit_exercise(f'Exercise {i}', duration=(i + 1) % 60)
+        tracked = (time.perf_counter() - t0) / edits * 1e6
+        saver.flush()
+
+        # UI responsiveness: tick gaps while idle vs while one full save runs
+        idle_end = time.perf_counter() + saver.stats['last_save']
+        idle = _max_tick_gap(lambda: time.perf_counter() > idle_end)
+        saves = saver.stats['saves']
+        m.edit_exercise('Exercise 0', duration=1)
+        saving = _max_tick_gap(lambda: saver.stats['saves'] > saves)
+        saver.stop()
+        size = os.path.getsize(path)
+
+    s = saver.stats
+    print(f'{n} exercises, {edits} edits, {s["saves"]} saves')
+    print(f'edit: {plain:.1f} us plain, {tracked:.1f} us with autosave '
+          f'(max hook time {s["max_hook_time"] * 1e6:.1f} us)')
+    print(f'save: last {s["last_save"] * 1000:.1f} ms, max {s["max_save"] * 1000:.1f} ms '
+          f'(background thread)')
+    print(f'ui:   longest tick gap {idle * 1000:.2f} ms idle, {saving * 1000:.2f} ms during a save')
+    print(f'file: {size / 1e6:.1f} MB')
+
+
+if __name__ == '__main__':
+    # Usage: python3 autosave.py [num_exercises]
+    import sys
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
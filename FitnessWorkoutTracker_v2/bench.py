@@ -0,0 +1,198 @@
+# bench.py
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from workout import WorkoutManager
+
+CATEGORIES = ['Strength', 'Cardio', 'Core', 'Flexibility', 'General']
+MUSCLE_GROUPS = ['Chest', 'Legs', 'Back', 'Core', 'Arms', 'Shoulders', 'Full Body']
+WORDS = ['Barbell', 'Dumbbell', 'Cable', 'Kettlebell', 'Band', 'Incline', 'Decline',
+         'Seated', 'Standing', 'Single-Leg', 'Press', 'Row', 'Curl', 'Squat', 'Lunge',
+         'Raise', 'Fly', 'Pull', 'Push', 'Hold']
+
+
+def generate_catalog(n, seed=0, names='random', order='random', category_skew=0.0):
+    """Deterministic synthetic catalog as a list of add_exercise() argument tuples.
+
+    names:  'random' (random letters) or 'words' (realistic names that share
+            long prefixes, e.g. "Barbell Incline Press 17")
+    order:  'random', 'sorted' or 'reversed' (by lowercase name)
+    category_skew: 0 = categories equally likely, higher = first categories
+            more common (weights 1 / (i + 1) ** skew)
+    """
+    rng = random.Random(seed)
+    weights = [1 / (i + 1) ** category_skew for i in range(len(CATEGORIES))]
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+
+    rows = []
+    for i in range(n):
+        if names == 'words':
+            name = ' '.join(rng.choice(WORDS) for _ in range(3)) + f' {i}'
+        elif names == 'random':
+            name = ''.join(rng.choice(letters) for _ in range(8)).capitalize() + f' {i}'
+        else:
+            raise ValueError("names must be 'random' or 'words'")
+        rows.append((name, rng.choice(MUSCLE_GROUPS), rng.randint(1, 6), rng.randint(1, 30),
+                     rng.randint(1, 60), rng.randint(1, 10),
+                     rng.choices(CATEGORIES, weights)[0]))
+
+    if order == 'sorted':
+        rows.sort(key=lambda row: row[0].lower())
+    elif order == 'reversed':
+        rows.sort(key=lambda row: row[0].lower(), reverse=True)
+    elif order != 'random':
+        raise ValueError("order must be 'random', 'sorted' or 'reversed'")
+    return rows
+
+
+def _build(rows):
+    m = WorkoutManager()
+    for row in rows:
+        m.add_exercise(*row)
+    return m
+
+
+def _time(fn, repeat, setup=None):
+    # Best of `repeat` runs, setup is not timed
+    best = None
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        t0 = time.perf_counter()
+        fn(arg)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_size(n, repeat=3, sample=1000, sort_limit=20000, **catalog):
+    # Time every operation for one catalog size, returns {op: seconds or note}
+    rows = generate_catalog(n, **catalog)
+    rng = random.Random(n)
+    names = [row[0] for row in rng.sample(rows, min(sample, n))]
+    results = {}
+
+    def measure(op, fn, setup=None):
+        try:
+            results[op] = _time(fn, repeat, setup)
+        except RecursionError:
+            # The BST is recursive; a degenerate (sorted) tree is too deep
+            results[op] = 'error: RecursionError'
+
+    measure('insert', lambda _: _build(rows))
+    if not isinstance(results['insert'], float):
+        return results
+    m = _build(rows)
+
+    measure('find', lambda _: [m.exercise_bst.find_by_name(x) for x in names])
+    measure('delete', lambda fresh: [fresh.delete_exercise(x) for x in names],
+            setup=lambda: _build(rows))
+    measure('list', lambda _: m.get_all_exercises())
+    measure('list_filtered', lambda _: m.get_all_exercises(category_filter='Cardio', search='a'))
+
+    # insertion_sort is quadratic, so only run it up to sort_limit
+    if n <= sort_limit:
+        measure('list_sorted', lambda _: m.get_all_exercises(sort_key='duration'))
+    else:
+        results['list_sorted'] = f'skipped: n > {sort_limit}'
+
+    picks = [m.exercise_bst.find_by_name(x) for x in names]
+    def routine(_):
+        for ex in picks:
+            m.add_to_daily_routine(ex)
+        m.get_routine_list()
+        while m.complete_next_exercise():
+            pass
+    measure('routine_queue', routine)
+
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, 'catalog.json')
+    def save(_):
+        with open(path, 'w') as f:
+            json.dump([ex.to_dict() for ex in m.get_all_exercises()], f)
+    def load(_):
+        with open(path) as f:
+            WorkoutManager().load_exercises(json.load(f))
+    measure('json_save', save)
+    measure('json_load', load)
+    os.remove(path)
+    os.rmdir(folder)
+    return results
+
+
+def run(sizes, orders=('random',), repeat=3, **options):
+    # Results keyed as "order/size/op"
+    results = {}
+    for order in orders:
+        for n in sizes:
+            for op, value in run_size(n, repeat=repeat, order=order, **options).items():
+                results[f'{order}/{n}/{op}'] = value
+                shown = f'{value * 1000:10.2f} ms' if isinstance(value, float) else value
+                print(f'{order:>8} {n:>8} {op:<14} {shown}')
+    return results
+
+
+def compare(results, baseline, threshold=0.25):
+    # Ops that got more than `threshold` slower (or started failing).
+    # 'skipped: ...' only means this run used other limits, so it is ignored
+    regressions = []
+    for key, old in baseline.items():
+        new = results.get(key)
+        if not isinstance(old, float) or new is None:
+            continue
+        if isinstance(new, float):
+            if new > old * (1 + threshold):
+                regressions.append((key, old, new))
+        elif str(new).startswith('error:'):
+            regressions.append((key, old, new))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the workout tracker data structures.')
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='comma separated catalog sizes (up to 1000000)')
+    parser.add_argument('--orders', default='random,sorted',
+                        help='insert orders: random, sorted, reversed')
+    parser.add_argument('--names', default='random', choices=['random', 'words'])
+    parser.add_argument('--category-skew', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--sort-limit', type=int, default=20000,
+                        help='largest size for the (quadratic) sorted listing')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed slowdown before flagging (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    results = run([int(x) for x in args.sizes.split(',')], args.orders.split(','),
+                  repeat=args.repeat, sort_limit=args.sort_limit, seed=args.seed,
+                  names=args.names, category_skew=args.category_skew)
+
+    with open(args.output, 'w') as f:
+        json.dump({'python': platform.python_version(), 'platform': platform.platform(),
+                   'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'results': results}, f, indent=2)
+    print(f'Results written to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for key, old, new in regressions:
+            shown = f'{new * 1000:.2f} ms' if isinstance(new, float) else new
+            print(f'REGRESSION {key}: {old * 1000:.2f} ms -> {shown}')
+        if regressions:
+            return 1
+        print('No regressions.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,13 @@
 # data_structures,py
 
+# Optional callback fn(counter_name) for every BST step, set by instrument.py.
+# Counting happens inside the helpers so it adds no extra recursion depth.
+_step_counter = None
+
+def set_step_counter(fn):
+    global _step_counter
+    _step_counter = fn
+
 # Binary Search Tree (stores exercises alphabetically by name)
 class BSTNode:
     def __init__(self, exercise):
@@ -19,6 +27,8 @@ class ExerciseBST:
         return self._insert(self.root, exercise)
 
     def _insert(self, node, exercise):
+        if _step_counter:
+            _step_counter('bst_insert_steps')
         # Avoid duplicates based on name
         if exercise.name.lower() == node.exercise.name.lower():
             return False
@@ -44,6 +54,8 @@ class ExerciseBST:
 
     def _in_order(self, node, items):
         # Classic in-order traversal
+        if _step_counter:
+            _step_counter('bst_in_order_calls')
         if node:
             self._in_order(node.left, items)
             items.append(node.exercise)
@@ -54,6 +66,8 @@ class ExerciseBST:
         return self._find(self.root, name.lower()) if name else None
 
     def _find(self, node, name):
+        if _step_counter:
+            _step_counter('bst_find_steps')
         if not node:
             return None
         if name == node.exercise.name.lower():
@@ -69,6 +83,8 @@ class ExerciseBST:
 
     def _delete(self, node, name):
         # Standard BST delete logic
+        if _step_counter:
+            _step_counter('bst_delete_steps')
         if not node:
             return node, None
 
@@ -109,6 +125,38 @@ class ExerciseBST:
 
         return node, deleted
 
+    def stats(self):
+        # Size, height and average node depth (walks the tree without recursion)
+        size = height = total_depth = 0
+        stack = [(self.root, 1)] if self.root else []
+        while stack:
+            node, depth = stack.pop()
+            size += 1
+            total_depth += depth
+            height = max(height, depth)
+            if node.left:
+                stack.append((node.left, depth + 1))
+            if node.right:
+                stack.append((node.right, depth + 1))
+        return {'size': size, 'height': height,
+                'avg_depth': total_depth / size if size else 0.0}
+
+
+def balanced_order(items):
+    # Reorder a sorted list so inserting it one by one gives a balanced BST
+    # (middle item first, then the middles of each half, and so on)
+    out = []
+    stack = [(0, len(items))]
+    while stack:
+        lo, hi = stack.pop()
+        if lo >= hi:
+            continue
+        mid = (lo + hi) // 2
+        out.append(items[mid])
+        stack.append((mid + 1, hi))
+        stack.append((lo, mid))
+    return out
+
 
 # Simple linked-list queue (for daily workout order)
 class QueueNode:
@@ -120,9 +168,39 @@ class ExerciseQueue:
     def __init__(self):
         self.front = self.rear = None
         self._size = 0                 # keep track of size manually
+        self._shared = False           # nodes borrowed from a template chain
+
+    def share(self, front, rear, size):
+        # Point the queue at an existing node chain in O(1) (no copying).
+        # Dequeue only moves `front`, so the chain stays untouched until
+        # the first enqueue, which copies what is left (copy-on-write).
+        self.front, self.rear, self._size = front, rear, size
+        self._shared = front is not None
+
+    def snapshot(self):
+        # O(1) copy of the current state, restore it later with share().
+        # Marks the nodes as shared so the next enqueue copies them first.
+        self._shared = self.front is not None
+        return (self.front, self.rear, self._size)
+
+    def _unshare(self):
+        # Copy the remaining borrowed nodes so we can append safely
+        cur = self.front
+        self.front = self.rear = None
+        while cur:
+            node = QueueNode(cur.exercise)
+            if self.rear:
+                self.rear.next = node
+            else:
+                self.front = node
+            self.rear = node
+            cur = cur.next
+        self._shared = False
 
     def enqueue(self, exercise):
         # Add to end of queue
+        if self._shared:
+            self._unshare()
         node = QueueNode(exercise)
         if not self.rear:
             self.front = self.rear = node
@@ -139,6 +217,35 @@ class ExerciseQueue:
         self.front = self.front.next
         if not self.front:
             self.rear = None
+            self._shared = False
+        self._size -= 1
+        return ex
+
+    def push_front(self, exercise):
+        # Put an exercise back at the front (used by undo).
+        # The new node only points at the old front, so shared chains stay intact.
+        node = QueueNode(exercise)
+        node.next = self.front
+        self.front = node
+        if not self.rear:
+            self.rear = node
+        self._size += 1
+
+    def pop_back(self):
+        # Remove from the end (used by undo), O(n) because the list is singly linked
+        if not self.front:
+            return None
+        if self._shared:
+            self._unshare()
+        ex = self.rear.exercise
+        if self.front is self.rear:
+            self.front = self.rear = None
+        else:
+            cur = self.front
+            while cur.next is not self.rear:
+                cur = cur.next
+            cur.next = None
+            self.rear = cur
         self._size -= 1
         return ex
 
@@ -156,6 +263,7 @@ class ExerciseQueue:
         # Reset queue
         self.front = self.rear = None
         self._size = 0
+        self._shared = False
 
     def to_list(self):
         # Convert queue to Python list for display
@@ -0,0 +1,54 @@
+# history.py
+
+from collections import deque
+
+
+class History:
+    """Undo/redo stacks of small inverse-operation records.
+
+    Catalog records only keep the one exercise that changed, so every step
+    costs O(1) memory no matter how big the catalog is:
+        ('add', exercise)           exercise added
+        ('delete', exercise)        exercise removed
+        ('edit', old_data, new_data)
+    Routine records are O(1) to store. Clearing or loading a template keeps
+    the previous routine as a (front, rear, size) snapshot of its nodes, which
+    are shared rather than copied (see ExerciseQueue.snapshot):
+        ('enqueue', exercise)       ('dequeue', exercise)
+        ('clear', before)           ('template', before, template)
+    Replaying is O(1) too, except undoing an enqueue: pop_back() walks the
+    singly linked queue, O(routine length).
+    """
+
+    def __init__(self, limit=500):
+        self.undo_stack = deque(maxlen=limit)   # oldest steps drop off
+        self.redo_stack = []
+
+    def record(self, entry):
+        # A new change makes the redo steps invalid
+        self.undo_stack.append(entry)
+        self.redo_stack.clear()
+
+    def pop_undo(self):
+        if not self.undo_stack:
+            return None
+        entry = self.undo_stack.pop()
+        self.redo_stack.append(entry)
+        return entry
+
+    def pop_redo(self):
+        if not self.redo_stack:
+            return None
+        entry = self.redo_stack.pop()
+        self.undo_stack.append(entry)
+        return entry
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
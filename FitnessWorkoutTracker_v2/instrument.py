@@ -0,0 +1,200 @@
+# instrument.py
+
+import functools
+import json
+import time
+from contextlib import contextmanager
+
+import data_structures
+import workout
+
+# Manager operations that get a timer when instrumentation is on
+MANAGER_OPS = ['add_exercise', 'edit_exercise', 'delete_exercise', 'get_all_exercises',
+               'find_similar', 'add_to_daily_routine', 'complete_next_exercise',
+               'load_template', 'undo', 'redo']
+
+# BST step counters (bst_insert_steps, bst_find_steps, bst_delete_steps,
+# bst_in_order_calls) are counted inside the recursive helpers themselves:
+# wrapping them would double the stack frames per tree level.
+
+
+class Metrics:
+    """Counters and timers collected while instrumentation is enabled."""
+
+    def __init__(self):
+        self.counters = {}
+        self.timers = {}     # name -> [count, total seconds, max seconds]
+        self.gauges = {}
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, seconds):
+        t = self.timers.get(name)
+        if t is None:
+            self.timers[name] = [1, seconds, seconds]
+        else:
+            t[0] += 1
+            t[1] += seconds
+            if seconds > t[2]:
+                t[2] = seconds
+
+    def reset(self):
+        self.counters.clear()
+        self.timers.clear()
+        self.gauges.clear()
+
+    def to_dict(self):
+        return {
+            'counters': dict(self.counters),
+            'timers': {name: {'count': c, 'total_seconds': total, 'max_seconds': mx,
+                              'avg_seconds': total / c}
+                       for name, (c, total, mx) in self.timers.items()},
+            'gauges': dict(self.gauges),
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self):
+        # Prometheus text exposition format
+        lines = ['# TYPE fwt_operation_seconds summary']
+        for name, (c, total, _) in sorted(self.timers.items()):
+            lines.append(f'fwt_operation_seconds_count{{op="{name}"}} {c}')
+            lines.append(f'fwt_operation_seconds_sum{{op="{name}"}} {total:.9f}')
+        lines.append('# TYPE fwt_operation_max_seconds gauge')
+        for name, (_, _, mx) in sorted(self.timers.items()):
+            lines.append(f'fwt_operation_max_seconds{{op="{name}"}} {mx:.9f}')
+        lines.append('# TYPE fwt_events_total counter')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f'fwt_events_total{{event="{name}"}} {value}')
+        lines.append('# TYPE fwt_gauge gauge')
+        for name, value in sorted(self.gauges.items()):
+            lines.append(f'fwt_gauge{{name="{name}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+# (owner, attribute, original) for everything we patched, so disable() can undo it
+_patched = []
+
+
+def _timed(name, fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            metrics.observe(name, time.perf_counter() - t0)
+    return wrapper
+
+
+def _counted(name, fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        metrics.count(name)
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def _patch(owner, attr, wrap):
+    original = getattr(owner, attr)
+    _patched.append((owner, attr, original))
+    setattr(owner, attr, wrap(original))
+
+
+def is_enabled():
+    return bool(_patched)
+
+
+def enable(app=None):
+    """Wrap the hot paths with timers and counters.
+
+    Nothing is wrapped until this is called, so there is no cost at all when
+    instrumentation is off. Pass the App to also time the UI refresh path
+    (App callbacks look these methods up at call time, so they see the wrappers).
+    """
+    if _patched:
+        return
+    for op in MANAGER_OPS:
+        _patch(workout.WorkoutManager, op, functools.partial(_timed, op))
+    data_structures.set_step_counter(metrics.count)
+
+    # workout.py imported insertion_sort by name, so patch it there
+    _patch(workout, 'insertion_sort', functools.partial(_timed, 'insertion_sort'))
+
+    if app is not None:
+        _patch(app, '_refresh_exercise_list', functools.partial(_timed, 'ui_refresh_exercise_list'))
+        _patch(app, '_refresh_routine_label', functools.partial(_timed, 'ui_refresh_routine_label'))
+        _patch(app.tree, 'insert', functools.partial(_counted, 'ui_tree_inserts'))
+        _patch(app.tree, 'delete', functools.partial(_counted, 'ui_tree_deletes'))
+
+
+def disable():
+    # Put every original function back (newest first)
+    data_structures.set_step_counter(None)
+    while _patched:
+        owner, attr, original = _patched.pop()
+        if isinstance(owner, type) or owner is workout:
+            setattr(owner, attr, original)
+        else:
+            # Instance attributes: drop the override to fall back to the class
+            try:
+                delattr(owner, attr)
+            except AttributeError:
+                setattr(owner, attr, original)
+
+
+def collect(manager):
+    # Snapshot index statistics into gauges (tree shape, catalog size)
+    stats = manager.exercise_bst.stats()
+    metrics.gauges['bst_size'] = stats['size']
+    metrics.gauges['bst_height'] = stats['height']
+    metrics.gauges['bst_avg_depth'] = round(stats['avg_depth'], 3)
+    metrics.gauges['routine_length'] = manager.daily_routine.size()
+    metrics.gauges['undo_steps'] = len(manager.history.undo_stack)
+
+
+def dump(path, manager=None):
+    # Write metrics as Prometheus text (.prom / .txt) or JSON (anything else)
+    if manager is not None:
+        collect(manager)
+    text = metrics.to_prometheus() if path.endswith(('.prom', '.txt')) else metrics.to_json()
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
+
+
+@contextmanager
+def capture(prefix, cpu=True, memory=True, top=25):
+    """Profile a block of code.
+
+    cpu:    cProfile stats saved to <prefix>.prof (open with pstats or snakeviz)
+    memory: tracemalloc top allocations saved to <prefix>.mem.txt, and the
+            peak traced memory stored as a gauge
+    """
+    profiler = None
+    if cpu:
+        import cProfile
+        profiler = cProfile.Profile()
+    if memory:
+        import tracemalloc
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    try:
+        yield metrics
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(prefix + '.prof')
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            metrics.gauges['tracemalloc_peak_bytes'] = peak
+            with open(prefix + '.mem.txt', 'w') as f:
+                for stat in snapshot.statistics('lineno')[:top]:
+                    f.write(f'{stat}\n')
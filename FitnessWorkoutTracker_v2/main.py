@@ -1,9 +1,17 @@
 # main.py
 
+import os
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from workout import WorkoutManager
 from exercise import Exercise
+from templates import save_templates, load_templates
+from autosave import AutoSaver
+import instrument
+
+# Where the catalog is saved automatically after every change
+AUTOSAVE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'autosave.json')
+AUTOSAVE_BACKUP_PATH = AUTOSAVE_PATH + '.bak'
 
 class App(tk.Tk):
     def __init__(self):
@@ -23,8 +31,34 @@ class App(tk.Tk):
         # Workout manager handles all exercise data (Modularity)
         self.manager = WorkoutManager()
 
-        # Load starter exercises so the UI isn't empty (Usability)
-        self._seed_sample_exercises()
+        # Changes are saved in the background so a crash loses nothing (Stability)
+        self.autosaver = AutoSaver(AUTOSAVE_PATH)
+        self.autosave_on = True
+
+        # Restore the last session, or load starter exercises so the UI isn't empty (Usability)
+        restored, restore_error = False, None
+        try:
+            self._load_exercises(AUTOSAVE_PATH)
+            restored = True
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            # Keep the unreadable file aside so autosave never overwrites it
+            restore_error = e
+            try:
+                os.replace(AUTOSAVE_PATH, AUTOSAVE_BACKUP_PATH)
+            except OSError:
+                # Could not move it, so autosave stays off for this session
+                self.autosave_on = False
+        if not restored:
+            self._seed_sample_exercises()
+            self.manager.history.clear()
+            if self.autosave_on:
+                self.autosaver.attach(self.manager)
+        if self.autosave_on:
+            self.autosaver.start()
+        self._autosave_saves = self._autosave_errors = 0
+        self._autosave_warned = False
 
         # Build the whole interface (Modularity / Readability)
         self._build_ui()
@@ -32,6 +66,18 @@ class App(tk.Tk):
         # Make sure the list updates as soon as the app loads
         self._refresh_exercise_list()
 
+        if restore_error:
+            kept = AUTOSAVE_BACKUP_PATH if self.autosave_on else f'{AUTOSAVE_PATH} (autosave is off)'
+            messagebox.showwarning('Autosave', f'Could not restore the last session ({restore_error}).\n'
+                                               f'The file was kept as {kept}.')
+
+        # Let the user know if background saving starts failing (Stability)
+        self.after(2000, self._check_autosave)
+
+        # Keyboard shortcuts for undo/redo (Usability)
+        self.bind('<Control-z>', lambda e: self._undo())
+        self.bind('<Control-y>', lambda e: self._redo())
+
         # Confirm close properly (Stability)
         self.protocol('WM_DELETE_WINDOW', self._on_close)
 
@@ -89,6 +135,8 @@ class App(tk.Tk):
         ttk.Button(parent, text='Add Exercise', command=self._open_add_dialog).pack(fill='x', pady=4)
         ttk.Button(parent, text='Clear Routine', command=self._clear_routine).pack(fill='x', pady=4)
         ttk.Button(parent, text='Complete Next', command=self._complete_next).pack(fill='x', pady=4)
+        ttk.Button(parent, text='Undo', command=self._undo).pack(fill='x', pady=4)
+        ttk.Button(parent, text='Redo', command=self._redo).pack(fill='x', pady=4)
 
         # Dropdown to add selected exercise into routine
         ttk.Label(parent, text='Add to Routine:', font=('Helvetica',10,'bold')).pack(anchor='w', pady=(10,0))
@@ -97,6 +145,11 @@ class App(tk.Tk):
         self.add_routine_combo.pack(anchor='w', pady=2)
         ttk.Button(parent, text='Add Selected', command=self._add_selected_to_routine).pack(fill='x', pady=4)
 
+        # Routine templates (saved routines that can be loaded in one click)
+        ttk.Separator(parent, orient='horizontal').pack(fill='x', pady=8)
+        ttk.Button(parent, text='Save as Template', command=self._save_template).pack(fill='x', pady=4)
+        ttk.Button(parent, text='Load Template', command=self._load_template).pack(fill='x', pady=4)
+
         # Keep routine dropdown updated
         self._update_routine_dropdown()
 
@@ -122,6 +175,35 @@ class App(tk.Tk):
         else:
             messagebox.showerror('Error', 'Selected exercise not found.')
 
+    def _save_template(self):
+        # Store the current routine as a named template
+        if not self.manager.get_routine_list():
+            messagebox.showinfo('Template', 'Routine is empty. Add exercises to routine first.')
+            return
+        name = simpledialog.askstring('Save Template', 'Template name:', parent=self)
+        if not name or not name.strip():
+            return
+        self.manager.save_template(name)
+        messagebox.showinfo('Template', f'Saved template "{name.strip()}".')
+
+    def _load_template(self):
+        # Replace today's routine with a saved template
+        names = self.manager.get_template_names()
+        if not names:
+            messagebox.showinfo('Template', 'No templates saved yet.')
+            return
+        name = simpledialog.askstring('Load Template',
+                                      'Template name:\n' + '\n'.join(names), parent=self)
+        if not name:
+            return
+        template = self.manager.load_template(name)
+        if not template:
+            messagebox.showerror('Error', 'Template not found.')
+            return
+        self._refresh_routine_label()
+        duration, difficulty = self.manager.template_stats(name)
+        messagebox.showinfo('Template', f'Loaded "{template.name}": {duration} min, avg difficulty {difficulty:.1f}.')
+
     def _build_content(self, parent):
         # Top toolbar for searching and sorting
         toolbar = ttk.Frame(parent)
@@ -140,7 +222,8 @@ class App(tk.Tk):
         self.sort_var = tk.StringVar(value='name')
         ttk.Combobox(toolbar, textvariable=self.sort_var,
                      values=['name','duration','difficulty'], width=12).grid(row=0, column=3)
-        ttk.Button(toolbar, text='Apply', command=self._refresh_exercise_list).grid(row=0, column=4, padx=6)
+        # Lambda looks the method up on every click (instrument.enable can wrap it later)
+        ttk.Button(toolbar, text='Apply', command=lambda: self._refresh_exercise_list()).grid(row=0, column=4, padx=6)
 
         # Treeview that shows all exercises (Readable)
         self.tree = ttk.Treeview(parent,
@@ -160,6 +243,7 @@ class App(tk.Tk):
         # Right-click menu for quick actions
         self.menu = tk.Menu(self, tearoff=0)
         self.menu.add_command(label='Add to Routine', command=self._menu_add_to_routine)
+        self.menu.add_command(label='Find Similar', command=self._menu_find_similar)
         self.menu.add_command(label='Edit', command=self._menu_edit)
         self.menu.add_command(label='Delete', command=self._menu_delete)
         self.tree.bind('<Button-3>', self._show_context_menu)
@@ -190,6 +274,8 @@ class App(tk.Tk):
         ttk.Button(parent, text='Start Routine', command=self._start_routine).pack(fill='x', pady=4)
         ttk.Button(parent, text='Save Exercises ', command=self._save_to_file).pack(fill='x', pady=4)
         ttk.Button(parent, text='Load Exercises ', command=self._load_from_file).pack(fill='x', pady=4)
+        ttk.Button(parent, text='Save Templates ', command=self._save_templates_to_file).pack(fill='x', pady=4)
+        ttk.Button(parent, text='Load Templates ', command=self._load_templates_from_file).pack(fill='x', pady=4)
 
     def _refresh_exercise_list(self):
         # Clear the tree before repopulating
@@ -266,6 +352,17 @@ class App(tk.Tk):
             self.manager.add_to_daily_routine(ex)
             self._refresh_routine_label()
 
+    def _menu_find_similar(self):
+        # Suggest substitutes for the selected exercise (e.g. equipment busy)
+        sel = self.tree.selection()
+        if not sel:
+            return
+        similar = self.manager.find_similar(sel[0], k=5)
+        if not similar:
+            messagebox.showinfo('Similar Exercises', 'No similar exercises found.')
+            return
+        messagebox.showinfo('Similar Exercises', '\n'.join(str(ex) for ex in similar))
+
     def _menu_edit(self):
         # Edit selected exercise from context menu
         sel = self.tree.selection()
@@ -281,7 +378,11 @@ class App(tk.Tk):
 
         if dialog.result:
             try:
-                self.manager.edit_exercise(name, **dialog.result)
+                if not self.manager.edit_exercise(name, **dialog.result):
+                    # Rename clashes with another exercise (or it was removed meanwhile)
+                    messagebox.showerror('Error', f'Could not update: an exercise named '
+                                                  f'"{dialog.result["name"]}" already exists.')
+                    return
                 self._refresh_exercise_list()
                 messagebox.showinfo('Updated','Exercise updated.')
             except Exception as e:
@@ -374,40 +475,99 @@ class App(tk.Tk):
 
     def _load_from_file(self):
         # Load exercises from JSON file (Stability)
-        import json, tkinter.filedialog as fd
+        import tkinter.filedialog as fd
         path = fd.askopenfilename(filetypes=[('JSON', '*.json')])
         if not path:
             return
 
+        self._load_exercises(path)
+        self._refresh_exercise_list()
+        messagebox.showinfo('Loaded','Exercises loaded from file.')
+
+    def _load_exercises(self, path):
+        # Build a new manager from a saved JSON file; the current one is only
+        # replaced (and autosave switched over) once loading fully worked
+        import json
         with open(path, 'r') as f:
             data = json.load(f)
 
-        # Reset manager and rebuild from loaded file
-        self.manager = WorkoutManager()
-        for d in data:
-            try:
-                self.manager.add_exercise(
-                    d.get('name'),
-                    d.get('muscle_group','General'),
-                    d.get('sets',1),
-                    d.get('reps',1),
-                    int(d.get('duration',0)),
-                    int(d.get('difficulty',1)),
-                    d.get('category','General')
-                )
-            except Exception:
-                # Ignore invalid entries while loading
-                pass
+        manager = WorkoutManager()
+        manager.load_exercises(data)
+
+        # Templates only store names, so they carry over to the new catalog
+        for template in self.manager.templates.values():
+            manager.add_template(template)
+
+        # Loading is a fresh start, not a list of undoable adds
+        manager.history.clear()
+        if self.autosave_on:
+            self.autosaver.attach(manager)
+        self.manager = manager
+
+    def _save_templates_to_file(self):
+        # Save all routine templates (names only) to a JSON file
+        import tkinter.filedialog as fd
+        path = fd.asksaveasfilename(defaultextension='.json', filetypes=[('JSON', '*.json')])
+        if not path:
+            return
+
+        count = save_templates(self.manager.templates.values(), path)
+        messagebox.showinfo('Saved', f'Saved {count} templates.')
+
+    def _load_templates_from_file(self):
+        # Load routine templates saved with _save_templates_to_file
+        import tkinter.filedialog as fd
+        path = fd.askopenfilename(filetypes=[('JSON', '*.json')])
+        if not path:
+            return
 
+        try:
+            templates = load_templates(path)
+        except Exception as e:
+            messagebox.showerror('Error', f'Failed to load templates: {e}')
+            return
+        for t in templates:
+            self.manager.add_template(t)
+        messagebox.showinfo('Loaded', f'Loaded {len(templates)} templates.')
+
+    def _undo(self):
+        # Revert the last catalog or routine change
+        if not self.manager.undo():
+            self.bell()
+            return
+        self._refresh_exercise_list()
+
+    def _redo(self):
+        # Re-apply the last undone change
+        if not self.manager.redo():
+            self.bell()
+            return
         self._refresh_exercise_list()
-        messagebox.showinfo('Loaded','Exercises loaded from file.')
 
     def _on_filter_change(self):
         # When switching categories, refresh the list
         self._refresh_exercise_list()
 
+    def _check_autosave(self):
+        # Warn once per failure streak; the saver keeps retrying on its own
+        stats = self.autosaver.stats
+        if stats['saves'] > self._autosave_saves:
+            self._autosave_warned = False
+        elif stats['errors'] > self._autosave_errors and not self._autosave_warned:
+            self._autosave_warned = True
+            messagebox.showwarning('Autosave', f'Autosave failed: {stats["last_error"]}\n'
+                                               'Changes are kept and saving will be retried.')
+        self._autosave_saves, self._autosave_errors = stats['saves'], stats['errors']
+        self.after(2000, self._check_autosave)
+
     def _on_close(self):
-        # Exit cleanly instead of force closing
+        # Exit cleanly instead of force closing (write any unsaved changes first)
+        if self.autosave_on and not self.autosaver.flush(timeout=10):
+            if not messagebox.askyesno('Autosave', f'Latest changes could not be saved '
+                                                   f'({self.autosaver.stats["last_error"]}).\n'
+                                                   'Close anyway?'):
+                return
+        self.autosaver.stop(timeout=1)
         self.destroy()
 
 
@@ -490,5 +650,17 @@ class AddExerciseDialog:
 
 if __name__ == '__main__':
     # Start the actual application
+    # FWT_INSTRUMENT=1 collects timings/counters and writes them on exit to
+    # FWT_METRICS (default metrics.json, use a .prom name for Prometheus text).
+    # FWT_PROFILE=<prefix> also saves cProfile/tracemalloc output.
     app = App()
-    app.mainloop()
+    if os.environ.get('FWT_INSTRUMENT') or os.environ.get('FWT_PROFILE'):
+        instrument.enable(app)
+        if os.environ.get('FWT_PROFILE'):
+            with instrument.capture(os.environ['FWT_PROFILE']):
+                app.mainloop()
+        else:
+            app.mainloop()
+        print('Metrics written to', instrument.dump(os.environ.get('FWT_METRICS', 'metrics.json'), app.manager))
+    else:
+        app.mainloop()
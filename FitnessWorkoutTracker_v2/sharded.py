@@ -0,0 +1,282 @@
+# sharded.py
+
+import heapq
+import sys
+import time
+import zlib
+from bisect import bisect_right
+from itertools import islice
+from multiprocessing import Pipe, Process
+
+from data_structures import ExerciseQueue
+from workout import WorkoutManager
+
+
+def _shard_worker(conn):
+    # Each worker process owns one normal WorkoutManager (one BST per shard)
+    manager = WorkoutManager()
+    while True:
+        op, args, kwargs = conn.recv()
+        if op == 'close':
+            conn.close()
+            return
+        try:
+            if op == 'add_many':
+                # Bulk insert, returns how many were actually added.
+                # Bad rows are skipped one by one, like load_exercises does
+                result = 0
+                for row in args[0]:
+                    try:
+                        if manager.add_exercise(*row):
+                            result += 1
+                    except (ValueError, TypeError, AttributeError):
+                        pass
+            elif op == 'list_page':
+                # Only the first `limit` rows leave the process
+                limit = kwargs.pop('limit')
+                result = manager.get_all_exercises(**kwargs)[:limit]
+            elif op == 'count':
+                result = len(manager.exercise_bst.in_order())
+            elif op == 'find_by_name':
+                result = manager.exercise_bst.find_by_name(*args)
+            else:
+                result = getattr(manager, op)(*args, **kwargs)
+            conn.send((True, result))
+        except Exception as e:
+            # Send the error back so the parent can raise it
+            conn.send((False, e))
+
+
+class ShardedWorkoutManager:
+    """WorkoutManager spread over worker processes.
+
+    Exercises are partitioned by name, either by hash or by name range.
+    Point operations go to the owning shard, list queries are sent to every
+    shard at once and the sorted partial lists are merged (k-way merge).
+    The daily routine stays in this process.
+
+    Exercises come back from the workers as pickled copies: changing one
+    returned by find_by_name / edit_exercise does not change the shard, use
+    edit_exercise for that. Copying every matching row is also what a full
+    listing costs, so for big catalogs pass `limit` to get_all_exercises.
+    """
+
+    def __init__(self, num_shards=4, partition='hash', boundaries=None):
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        if partition not in ('hash', 'range'):
+            raise ValueError("partition must be 'hash' or 'range'")
+
+        # Range partitioning needs sorted split points (num_shards - 1 of them)
+        if partition == 'range':
+            if boundaries is None:
+                boundaries = _default_boundaries(num_shards)
+            boundaries = sorted(b.lower() for b in boundaries)
+            if len(boundaries) != num_shards - 1:
+                raise ValueError("range partition needs num_shards - 1 boundaries")
+
+        self.num_shards = num_shards
+        self.partition = partition
+        self.boundaries = boundaries
+        self.daily_routine = ExerciseQueue()
+
+        # Start one worker process per shard, talking over a pipe
+        self._conns = []
+        self._procs = []
+        for _ in range(num_shards):
+            parent_conn, child_conn = Pipe()
+            proc = Process(target=_shard_worker, args=(child_conn,), daemon=True)
+            proc.start()
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._procs.append(proc)
+
+    # --- routing ---
+
+    def shard_for(self, name):
+        # Pick the shard that owns this exercise name
+        key = name.strip().lower()
+        if self.partition == 'range':
+            return bisect_right(self.boundaries, key)
+        # crc32 is stable across processes (unlike hash() on str)
+        return zlib.crc32(key.encode('utf-8')) % self.num_shards
+
+    def _call(self, shard, op, *args, **kwargs):
+        # Send one request to one shard and wait for the answer
+        conn = self._conns[shard]
+        conn.send((op, args, kwargs))
+        return self._gather([conn])[0]
+
+    def _scatter(self, op, *args, **kwargs):
+        # Send to every shard first so they all work in parallel, then gather
+        for conn in self._conns:
+            conn.send((op, args, kwargs))
+        return self._gather(self._conns)
+
+    def _gather(self, conns):
+        # Read every reply before raising, otherwise the unread ones would be
+        # taken as the answer to the next request on those pipes
+        replies = [conn.recv() for conn in conns]
+        for ok, result in replies:
+            if not ok:
+                raise result
+        return [result for _, result in replies]
+
+    # --- catalog operations (same names as WorkoutManager) ---
+
+    def add_exercise(self, name, muscle_group, sets, reps, duration, difficulty, category='General'):
+        if not name or not isinstance(name, str):
+            raise ValueError("Name must be a non-empty string")
+        return self._call(self.shard_for(name), 'add_exercise',
+                          name, muscle_group, sets, reps, duration, difficulty, category)
+
+    def add_exercises(self, rows):
+        # Bulk load: group rows by shard and send one message per shard
+        groups = [[] for _ in range(self.num_shards)]
+        for row in rows:
+            groups[self.shard_for(row[0])].append(row)
+        for conn, group in zip(self._conns, groups):
+            conn.send(('add_many', (group,), {}))
+        return sum(self._gather(self._conns))
+
+    def find_by_name(self, name):
+        if not name:
+            return None
+        return self._call(self.shard_for(name), 'find_by_name', name)
+
+    def edit_exercise(self, original_name, **kwargs):
+        shard = self.shard_for(original_name)
+        new_name = kwargs.get('name')
+
+        # A rename can move the exercise to another shard
+        if new_name and self.shard_for(new_name) != shard:
+            ex = self._call(shard, 'find_by_name', original_name)
+            if not ex:
+                return None
+            data = ex.to_dict()
+            data.update((k, v) for k, v in kwargs.items() if k in data)
+            moved = self._call(self.shard_for(new_name), 'add_exercise', **data)
+            if not moved:
+                return None
+            self._call(shard, 'delete_exercise', original_name)
+            return moved
+
+        return self._call(shard, 'edit_exercise', original_name, **kwargs)
+
+    def delete_exercise(self, name):
+        return self._call(self.shard_for(name), 'delete_exercise', name)
+
+    def count(self):
+        return sum(self._scatter('count'))
+
+    def get_all_exercises(self, sort_key=None, category_filter=None, search=None, limit=None):
+        # Each shard filters and sorts its own part in parallel.
+        # With a limit, no shard can add more than `limit` rows to the
+        # result, so each one only sends its first `limit`
+        query = dict(sort_key=sort_key, category_filter=category_filter, search=search)
+        if limit is None:
+            parts = self._scatter('get_all_exercises', **query)
+        else:
+            parts = self._scatter('list_page', limit=limit, **query)
+
+        # Shards return lists ordered by name and (stable) sort key,
+        # so merging on (key, name) gives the same order as one manager
+        if sort_key:
+            merge_key = lambda ex: (getattr(ex, sort_key), ex.name.lower())
+        else:
+            merge_key = lambda ex: ex.name.lower()
+        return list(islice(heapq.merge(*parts, key=merge_key), limit))
+
+    # --- daily routine (kept locally) ---
+
+    def add_to_daily_routine(self, exercise):
+        self.daily_routine.enqueue(exercise)
+
+    def complete_next_exercise(self):
+        return self.daily_routine.dequeue()
+
+    def get_routine_list(self):
+        return self.daily_routine.to_list()
+
+    def clear_routine(self):
+        self.daily_routine.clear()
+
+    # --- lifecycle ---
+
+    def close(self):
+        # Stop all worker processes
+        for conn, proc in zip(self._conns, self._procs):
+            try:
+                conn.send(('close', (), {}))
+                conn.close()
+            except (OSError, EOFError):
+                pass
+            proc.join(timeout=5)
+        self._conns = []
+        self._procs = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _default_boundaries(num_shards):
+    # Split the alphabet evenly when no boundaries are given
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [letters[len(letters) * i // num_shards] for i in range(1, num_shards)]
+
+
+def _synthetic_rows(n):
+    # Random-looking but repeatable names so the BSTs stay reasonably balanced
+    categories = ['Strength', 'Cardio', 'Core', 'Flexibility', 'General']
+    rows = []
+    for i in range(n):
+        key = zlib.crc32(str(i).encode())
+        rows.append((f'Exercise {key:08x}-{i}', 'Full Body', 1 + i % 5, 5 + i % 20,
+                     1 + i % 60, 1 + i % 10, categories[i % 5]))
+    return rows
+
+
+def benchmark(n=100000, max_workers=4):
+    # Scaling benchmark: same catalog, 1..max_workers shards
+    rows = _synthetic_rows(n)
+    print(f'{n} exercises')
+    # list / sorted copy every matching row back to this process; page only
+    # copies the first 100 (see the class docstring)
+    print(f'{"workers":>8} {"load (s)":>10} {"find (ms)":>10} {"list (s)":>10} '
+          f'{"sorted (s)":>11} {"page (ms)":>10}')
+    for workers in range(1, max_workers + 1):
+        with ShardedWorkoutManager(num_shards=workers) as m:
+            t0 = time.perf_counter()
+            m.add_exercises(rows)
+            load = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            for row in rows[:1000]:
+                m.find_by_name(row[0])
+            # Total seconds for 1000 lookups == milliseconds per lookup
+            find = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            m.get_all_exercises(category_filter='Cardio')
+            listing = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            m.get_all_exercises(sort_key='difficulty', category_filter='Cardio', search='ff')
+            sorted_listing = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            m.get_all_exercises(category_filter='Cardio', limit=100)
+            page = (time.perf_counter() - t0) * 1000
+
+        print(f'{workers:>8} {load:>10.3f} {find:>10.3f} {listing:>10.3f} '
+              f'{sorted_listing:>11.3f} {page:>10.2f}')
+
+
+if __name__ == '__main__':
+    # Usage: python3 sharded.py [num_exercises] [max_workers]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    benchmark(n, workers)
@@ -0,0 +1,255 @@
+# similarity.py
+
+from bisect import insort
+
+# How much each numeric field counts in the distance (divide by a typical range)
+FEATURE_SCALES = (5.0, 20.0, 30.0, 9.0)   # sets, reps, duration, difficulty
+
+# Extra distance for a different muscle group / category (like one-hot columns)
+MUSCLE_GROUP_PENALTY = 1.0
+CATEGORY_PENALTY = 0.5
+
+# Rebuild a tree once this share of its nodes are deleted
+REBUILD_RATIO = 0.5
+
+
+def features(ex):
+    # Numeric part of the feature vector (scaled so fields are comparable)
+    return (ex.sets / FEATURE_SCALES[0], ex.reps / FEATURE_SCALES[1],
+            ex.duration / FEATURE_SCALES[2], ex.difficulty / FEATURE_SCALES[3])
+
+
+class KDNode:
+    def __init__(self, point, exercise, axis):
+        self.point = point
+        self.exercise = exercise
+        self.axis = axis
+        self.deleted = False
+        self.left = None
+        self.right = None
+
+
+class KDTree:
+    """Small 4-D KD-tree (sets, reps, duration, difficulty).
+
+    Built balanced from a list, supports single inserts, and deletes by marking
+    nodes (the tree is rebuilt once too many nodes are marked).
+    """
+
+    def __init__(self, items=()):
+        # items: list of (point, exercise)
+        self.root = self._build(list(items), 0)
+        self.live = len(items)
+        self.dead = 0
+
+    def _build(self, items, depth):
+        # Median split on the current axis keeps the tree balanced
+        if not items:
+            return None
+        axis = depth % 4
+        items.sort(key=lambda item: item[0][axis])
+        mid = len(items) // 2
+        node = KDNode(items[mid][0], items[mid][1], axis)
+        node.left = self._build(items[:mid], depth + 1)
+        node.right = self._build(items[mid + 1:], depth + 1)
+        return node
+
+    def insert(self, point, exercise):
+        node = KDNode(point, exercise, 0)
+        self.live += 1
+        if not self.root:
+            self.root = node
+            return node
+
+        # Walk down like a BST, comparing on each node's axis
+        cur = self.root
+        while True:
+            if point[cur.axis] < cur.point[cur.axis]:
+                if not cur.left:
+                    cur.left = node
+                    break
+                cur = cur.left
+            else:
+                if not cur.right:
+                    cur.right = node
+                    break
+                cur = cur.right
+        node.axis = (cur.axis + 1) % 4
+        return node
+
+    def mark_deleted(self, node):
+        node.deleted = True
+        self.live -= 1
+        self.dead += 1
+        if self.dead > REBUILD_RATIO * (self.live + self.dead):
+            self.rebuild()
+
+    def items(self):
+        # All live (point, exercise) pairs
+        out = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            if not node.deleted:
+                out.append((node.point, node.exercise))
+            if node.left:
+                stack.append(node.left)
+            if node.right:
+                stack.append(node.right)
+        return out
+
+    def rebuild(self):
+        items = self.items()
+        self.root = self._build(items, 0)
+        self.live = len(items)
+        self.dead = 0
+
+    def search(self, target, best, k, offset, skip):
+        # Add this tree's nearest points to `best`, a sorted list of (dist², name, ex)
+        # holding at most k entries; ties on distance go to the smaller name.
+        # `offset` is the squared penalty every point in this tree gets.
+        stack = [(self.root, offset)] if self.root else []
+        while stack:
+            node, bound = stack.pop()
+            # Prune: everything under this node is farther than the k-th best
+            # (only strictly farther, an equal distance may still win on name)
+            if len(best) == k and bound > best[-1][0]:
+                continue
+
+            if not node.deleted and node.exercise is not skip:
+                p = node.point
+                d = offset + ((p[0] - target[0]) ** 2 + (p[1] - target[1]) ** 2 +
+                              (p[2] - target[2]) ** 2 + (p[3] - target[3]) ** 2)
+                name = node.exercise.name.lower()
+                if len(best) < k or (d, name) < best[-1][:2]:
+                    insort(best, (d, name, node.exercise))
+                    if len(best) > k:
+                        best.pop()
+
+            # Visit the near side first (pushed last), the far side only if the
+            # splitting plane is closer than the k-th best
+            diff = target[node.axis] - node.point[node.axis]
+            near, far = (node.left, node.right) if diff < 0 else (node.right, node.left)
+            if far:
+                stack.append((far, max(bound, offset + diff * diff)))
+            if near:
+                stack.append((near, bound))
+
+
+class SimilarityIndex:
+    """k-nearest-neighbour lookup for substitute exercises.
+
+    Distance² = scaled (sets, reps, duration, difficulty) distance²
+              + MUSCLE_GROUP_PENALTY² if the muscle group differs
+              + CATEGORY_PENALTY² if the category differs.
+    That is the same as adding one-hot columns, but instead each
+    (muscle group, category) pair gets its own KD-tree, and a tree is skipped
+    when its penalty alone is already worse than the k-th best match.
+    """
+
+    def __init__(self):
+        self.trees = {}    # (muscle_group, category) lowercased -> KDTree
+        self.nodes = {}    # exercise name lowercased -> (group key, KDNode)
+
+    @staticmethod
+    def _group(ex):
+        return (ex.muscle_group.lower(), str(ex.category).lower())
+
+    def build(self, exercises):
+        # Bulk (re)build, balanced trees
+        groups = {}
+        for ex in exercises:
+            groups.setdefault(self._group(ex), []).append((features(ex), ex))
+        self.trees = {key: KDTree(items) for key, items in groups.items()}
+        self.nodes = {}
+        for key, tree in self.trees.items():
+            self._reindex(key, tree)
+
+    def add(self, ex):
+        key = self._group(ex)
+        tree = self.trees.get(key)
+        if tree is None:
+            tree = self.trees[key] = KDTree()
+        self.nodes[ex.name.lower()] = (key, tree.insert(features(ex), ex))
+
+    def remove(self, name):
+        found = self.nodes.pop(name.lower(), None)
+        if not found:
+            return
+        key, node = found
+        tree = self.trees[key]
+        tree.mark_deleted(node)
+        if not tree.live:
+            del self.trees[key]
+        elif tree.dead == 0:
+            # The tree was rebuilt with new nodes, so refresh our pointers
+            self._reindex(key, tree)
+
+    def _reindex(self, key, tree):
+        stack = [tree.root] if tree.root else []
+        while stack:
+            node = stack.pop()
+            if not node.deleted:
+                self.nodes[node.exercise.name.lower()] = (key, node)
+            if node.left:
+                stack.append(node.left)
+            if node.right:
+                stack.append(node.right)
+
+    def nearest(self, ex, k=5):
+        # The k exercises closest to `ex` (not including `ex` itself), closest first
+        if k <= 0:
+            return []
+        target = features(ex)
+        mg, cat = self._group(ex)
+
+        # Trees in order of their fixed penalty, cheapest first
+        ordered = []
+        for key, tree in self.trees.items():
+            offset = 0.0
+            if key[0] != mg:
+                offset += MUSCLE_GROUP_PENALTY ** 2
+            if key[1] != cat:
+                offset += CATEGORY_PENALTY ** 2
+            ordered.append((offset, key, tree))
+        ordered.sort(key=lambda item: item[0])
+
+        best = []
+        for offset, _, tree in ordered:
+            if len(best) == k and offset > best[-1][0]:
+                break
+            tree.search(target, best, k, offset, ex)
+        return [entry[2] for entry in best]
+
+
+def benchmark(n=100000, queries=1000, k=5):
+    # Build an index over n synthetic exercises and time k-NN queries
+    import random
+    import time
+    from exercise import Exercise
+
+    rng = random.Random(42)
+    groups = ['Chest', 'Legs', 'Back', 'Core', 'Arms', 'Shoulders', 'Full Body']
+    categories = ['Strength', 'Cardio', 'Core', 'Flexibility', 'General']
+    exercises = [Exercise(f'Exercise {i}', rng.choice(groups), rng.randint(1, 6),
+                          rng.randint(1, 30), rng.randint(1, 60), rng.randint(1, 10),
+                          rng.choice(categories)) for i in range(n)]
+
+    index = SimilarityIndex()
+    t0 = time.perf_counter()
+    index.build(exercises)
+    build = time.perf_counter() - t0
+
+    sample = rng.sample(exercises, min(queries, n))
+    t0 = time.perf_counter()
+    for ex in sample:
+        index.nearest(ex, k)
+    per_query = (time.perf_counter() - t0) / len(sample) * 1000
+
+    print(f'{n} exercises: build {build:.2f}s, {per_query:.3f} ms per {k}-NN query')
+
+
+if __name__ == '__main__':
+    # Usage: python3 similarity.py [num_exercises]
+    import sys
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,94 @@
+# templates.py
+
+import json
+from data_structures import QueueNode
+
+
+class RoutineTemplate:
+    """A named routine that stores exercise names (keys), not copies.
+
+    The linked chain of queue nodes and the totals are built once and cached.
+    They are rebuilt only when the catalog has changed since (catalog version),
+    so loading the same template again is O(1).
+    """
+
+    def __init__(self, name, exercise_names):
+        if not name or not isinstance(name, str):
+            raise ValueError("Template name must be a non-empty string")
+        self.name = name.strip()
+        self.exercise_names = tuple(exercise_names)
+
+        # Cached data (filled by _build)
+        self._version = None
+        self._front = self._rear = None
+        self._size = 0
+        self._total_duration = 0
+        self._avg_difficulty = 0.0
+
+    def rename_exercise(self, old_name, new_name):
+        # Follow a catalog rename, returns True if this template used the name
+        old = old_name.strip().lower()
+        if not any(key.strip().lower() == old for key in self.exercise_names):
+            return False
+        self.exercise_names = tuple(new_name if key.strip().lower() == old else key
+                                    for key in self.exercise_names)
+        self._version = None
+        return True
+
+    def invalidate(self):
+        # Forget the cached chain (e.g. when moving to another catalog)
+        self._version = None
+
+    def _build(self, bst, version):
+        # Resolve names through the catalog and link the nodes once
+        if self._version == version:
+            return
+        front = rear = None
+        size = total_duration = total_difficulty = 0
+        for key in self.exercise_names:
+            ex = bst.find_by_name(key)
+            if not ex:
+                # Exercise was deleted from the catalog, just skip it
+                continue
+            node = QueueNode(ex)
+            if rear:
+                rear.next = node
+            else:
+                front = node
+            rear = node
+            size += 1
+            total_duration += ex.duration
+            total_difficulty += ex.difficulty
+
+        self._front, self._rear, self._size = front, rear, size
+        self._total_duration = total_duration
+        self._avg_difficulty = total_difficulty / size if size else 0.0
+        self._version = version
+
+    def instantiate(self, queue, bst, version):
+        # Make `queue` start from this template (shares the cached chain)
+        self._build(bst, version)
+        queue.share(self._front, self._rear, self._size)
+
+    def total_duration(self, bst, version):
+        self._build(bst, version)
+        return self._total_duration
+
+    def average_difficulty(self, bst, version):
+        self._build(bst, version)
+        return self._avg_difficulty
+
+
+def save_templates(templates, path):
+    # Write all templates as a compact {name: [exercise names]} mapping
+    data = {t.name: list(t.exercise_names) for t in templates}
+    with open(path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    return len(data)
+
+
+def load_templates(path):
+    # Read templates saved by save_templates
+    with open(path, 'r') as f:
+        data = json.load(f)
+    return [RoutineTemplate(name, names) for name, names in data.items()]
@@ -1,6 +1,17 @@
 # tests.py
 import unittest
 from workout import WorkoutManager
+from exercise import Exercise
+from sharded import ShardedWorkoutManager
+import json
+import sys
+import os
+import random
+import tempfile
+from autosave import AutoSaver
+import bench
+import instrument
+import similarity
 
 class TestWorkoutManager(unittest.TestCase):
     def setUp(self):
@@ -31,5 +42,360 @@ class TestWorkoutManager(unittest.TestCase):
         self.m.clear_routine()
         self.assertEqual(len(self.m.get_routine_list()), 0)
 
+class TestUndoRedo(unittest.TestCase):
+    def setUp(self):
+        self.m = WorkoutManager()
+        self.a = self.m.add_exercise('Push-Up','Chest',3,12,10,3,'Strength')
+
+    def test_catalog_changes(self):
+        # Edit (with rename) then delete, undo both, then redo both
+        self.m.edit_exercise('Push-Up', name='Wide Push-Up', sets=4)
+        self.m.delete_exercise('Wide Push-Up')
+        self.m.undo()
+        self.m.undo()
+        ex = self.m.exercise_bst.find_by_name('Push-Up')
+        self.assertIs(ex, self.a)
+        self.assertEqual(ex.sets, 3)
+        self.assertIsNone(self.m.exercise_bst.find_by_name('Wide Push-Up'))
+        self.m.redo()
+        self.m.redo()
+        self.assertEqual(self.m.get_all_exercises(), [])
+        self.assertIsNone(self.m.redo())
+
+    def test_routine_and_new_change_clears_redo(self):
+        self.m.add_to_daily_routine(self.a)
+        self.m.clear_routine()
+        self.m.undo()
+        self.assertEqual([e.name for e in self.m.get_routine_list()], ['Push-Up'])
+        self.m.add_exercise('Squat','Legs',4,15,15,4,'Strength')
+        self.assertFalse(self.m.history.can_redo())
+
+    def test_routine_steps(self):
+        # Enqueue/dequeue undo in place, including on a loaded template
+        b = self.m.add_exercise('Squat','Legs',4,15,15,4,'Strength')
+        self.m.save_template('Day', [self.a, b])
+        self.m.load_template('Day')
+        self.m.complete_next_exercise()
+        self.m.add_to_daily_routine(self.a)
+        self.m.undo()
+        self.m.undo()
+        self.assertEqual([e.name for e in self.m.get_routine_list()], ['Push-Up', 'Squat'])
+        self.m.undo()
+        self.assertEqual(self.m.get_routine_list(), [])
+        self.m.redo()
+        self.m.redo()
+        self.assertEqual([e.name for e in self.m.get_routine_list()], ['Squat'])
+        self.m.load_template('Day')
+        self.assertEqual([e.name for e in self.m.get_routine_list()], ['Push-Up', 'Squat'])
+
+    def test_routine_snapshots_are_shared(self):
+        # Clear and template loads keep the old nodes instead of copying them
+        b = self.m.add_exercise('Squat','Legs',4,15,15,4,'Strength')
+        self.m.add_to_daily_routine(self.a)
+        self.m.add_to_daily_routine(b)
+        front = self.m.daily_routine.front
+        self.m.save_template('Day', [b])
+        self.m.load_template('Day')
+        self.m.add_to_daily_routine(self.a)   # must not touch the old nodes
+        self.m.undo()
+        self.m.undo()
+        self.assertIs(self.m.daily_routine.front, front)
+        self.assertEqual([e.name for e in self.m.get_routine_list()], ['Push-Up', 'Squat'])
+        self.m.clear_routine()
+        self.m.undo()
+        self.assertEqual([e.name for e in self.m.get_routine_list()], ['Push-Up', 'Squat'])
+        self.m.add_to_daily_routine(self.a)
+        self.assertEqual(self.m.daily_routine.size(), 3)
+
+class TestSimilarExercises(unittest.TestCase):
+    def setUp(self):
+        self.m = WorkoutManager()
+        rng = random.Random(1)
+        for i in range(300):
+            self.m.add_exercise(f'Ex {i}', rng.choice(['Chest','Legs','Core']), rng.randint(1,5),
+                                rng.randint(1,20), rng.randint(1,30), rng.randint(1,10),
+                                rng.choice(['Strength','Cardio']))
+
+    def brute_force(self, name, k):
+        # Linear scan with the same distance as the index
+        target = self.m.exercise_bst.find_by_name(name)
+        def dist(ex):
+            a, b = similarity.features(ex), similarity.features(target)
+            d = sum((x - y) ** 2 for x, y in zip(a, b))
+            if ex.muscle_group != target.muscle_group:
+                d += similarity.MUSCLE_GROUP_PENALTY ** 2
+            if ex.category != target.category:
+                d += similarity.CATEGORY_PENALTY ** 2
+            return (d, ex.name.lower())
+        others = [ex for ex in self.m.get_all_exercises() if ex is not target]
+        return [ex.name for ex in sorted(others, key=dist)[:k]]
+
+    def test_matches_linear_scan(self):
+        for name in ('Ex 0', 'Ex 42', 'Ex 299'):
+            self.assertEqual([e.name for e in self.m.find_similar(name, 7)],
+                             self.brute_force(name, 7))
+
+    def test_ties_go_by_name(self):
+        # Equal distances are broken by name, whatever the tree layout
+        m = WorkoutManager()
+        for i in range(40):
+            m.add_exercise(f'E{(i * 17) % 40:02d}','Chest',3,10,10,5,'Strength')
+        self.assertEqual([e.name for e in m.find_similar('E00', 3)], ['E01', 'E02', 'E03'])
+        self.assertEqual([e.name for e in m.find_similar('E02', 3)], ['E00', 'E01', 'E03'])
+
+    def test_stays_in_sync(self):
+        # Build the index, then change the catalog through the manager
+        self.m.find_similar('Ex 0')
+        for i in range(1, 200):
+            self.m.delete_exercise(f'Ex {i}')
+        self.m.edit_exercise('Ex 250', name='Ex 250b', sets=1, reps=1)
+        self.m.undo()
+        self.m.add_exercise('Twin','Chest',3,10,10,5,'Strength')
+        self.assertEqual([e.name for e in self.m.find_similar('Ex 0', 5)],
+                         self.brute_force('Ex 0', 5))
+        self.assertEqual([e.name for e in self.m.find_similar('Twin', 5)],
+                         self.brute_force('Twin', 5))
+
+class TestAutoSave(unittest.TestCase):
+    def setUp(self):
+        self.m = WorkoutManager()
+        self.m.add_exercise('Push-Up','Chest',3,12,10,3,'Strength')
+        # Registered first so it is removed after the saver has stopped
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'autosave.json')
+        self.saver = AutoSaver(self.path, delay=0.01)
+        self.saver.attach(self.m)
+        self.saver.start()
+        self.addCleanup(self.saver.stop, 5)
+
+    def saved_names(self):
+        with open(self.path) as f:
+            return sorted(d['name'] for d in json.load(f))
+
+    def test_changes_are_written(self):
+        # A burst of changes ends up in the file, including renames and deletes
+        self.m.add_exercise('Squat','Legs',4,15,15,4,'Strength')
+        self.m.edit_exercise('Push-Up', name='Wide Push-Up')
+        self.m.add_exercise('Plank','Core',3,1,3,5,'Core')
+        self.m.delete_exercise('Plank')
+        self.assertTrue(self.saver.flush(5))
+        self.assertEqual(self.saved_names(), ['Squat', 'Wide Push-Up'])
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['autosave.json'])
+
+    def test_large_catalog_round_trip(self):
+        # The saved file must load back completely, even read in file order
+        order = list(range(2500))
+        random.Random(5).shuffle(order)
+        for i in order:
+            self.m.add_exercise(f'Ex {i:05d}','Core',1,1,1,1)
+        self.assertTrue(self.saver.flush(10))
+        with open(self.path) as f:
+            data = json.load(f)
+        restored = WorkoutManager()
+        self.assertEqual(restored.load_exercises(data), 2501)
+        in_file_order = WorkoutManager()
+        for d in data:
+            in_file_order.add_exercise(**d)
+        self.assertEqual(len(in_file_order.get_all_exercises()), 2501)
+        self.assertLessEqual(in_file_order.exercise_bst.stats()['height'], 13)
+
+    def test_load_sorted_file(self):
+        # Name-sorted files (e.g. from Save Exercises) also load in full
+        data = [{'name': f'Ex {i:05d}', 'muscle_group': 'Core', 'sets': 1, 'reps': 1,
+                 'duration': 1, 'difficulty': 1} for i in range(2000)]
+        m = WorkoutManager()
+        self.assertEqual(m.load_exercises(data), 2000)
+        self.assertEqual(len(m.get_all_exercises()), 2000)
+
+    def test_write_errors_are_retried(self):
+        # A missing folder fails the write; the thread keeps going and retries
+        errors = []
+        folder = os.path.join(os.path.dirname(self.path), 'later')
+        saver = AutoSaver(os.path.join(folder, 'autosave.json'), delay=0.01, on_error=errors.append)
+        saver.attach(self.m)
+        saver.start()
+        self.addCleanup(saver.stop, 5)
+        self.assertFalse(saver.flush(5))
+        self.assertGreaterEqual(saver.stats['errors'], 1)
+        self.assertIn('FileNotFoundError', saver.stats['last_error'])
+        self.assertTrue(errors)
+
+        # Once the folder exists a flush retries and succeeds, no new edit needed
+        os.mkdir(folder)
+        self.assertTrue(saver.flush(5))
+        with open(os.path.join(folder, 'autosave.json')) as f:
+            self.assertEqual(len(json.load(f)), 1)
+
+    def test_attach_new_manager(self):
+        # After loading a file the saver follows the new manager only
+        other = WorkoutManager()
+        other.add_exercise('Squat','Legs',4,15,15,4,'Strength')
+        self.saver.attach(other)
+        self.m.add_exercise('Lunge','Legs',3,10,5,3)
+        self.assertTrue(self.saver.flush(5))
+        self.assertEqual(self.saved_names(), ['Squat'])
+
+class TestBench(unittest.TestCase):
+    def test_generator_is_deterministic(self):
+        rows = bench.generate_catalog(200, seed=3, names='words', category_skew=2.0)
+        self.assertEqual(rows, bench.generate_catalog(200, seed=3, names='words', category_skew=2.0))
+        names = [r[0].lower() for r in bench.generate_catalog(200, seed=3, order='sorted')]
+        self.assertEqual(names, sorted(names))
+
+    def test_compare_flags_regressions(self):
+        baseline = {'random/1000/find': 0.010, 'random/1000/list': 0.010, 'sorted/1000/insert': 'error: RecursionError'}
+        results = {'random/1000/find': 0.011, 'random/1000/list': 0.020, 'sorted/1000/insert': 'error: RecursionError'}
+        self.assertEqual([r[0] for r in bench.compare(results, baseline, 0.25)], ['random/1000/list'])
+
+    def test_compare_ignores_skipped(self):
+        # A smaller --sort-limit skips an op, that is not a regression
+        baseline = {'random/1000/list_sorted': 0.010, 'random/1000/find': 0.010}
+        results = {'random/1000/list_sorted': 'skipped: n > 500', 'random/1000/find': 'error: RecursionError'}
+        self.assertEqual([r[0] for r in bench.compare(results, baseline, 0.25)], ['random/1000/find'])
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        instrument.metrics.reset()
+        self.addCleanup(instrument.disable)
+        self.addCleanup(instrument.metrics.reset)
+
+    def test_counts_and_restores(self):
+        original = WorkoutManager.add_exercise
+        instrument.enable()
+        m = WorkoutManager()
+        for name in ('B', 'A', 'C'):
+            m.add_exercise(name,'Core',1,1,1,1)
+        m.get_all_exercises(sort_key='duration')
+        m.exercise_bst.find_by_name('C')
+        self.assertEqual(instrument.metrics.timers['add_exercise'][0], 3)
+        self.assertEqual(instrument.metrics.timers['insertion_sort'][0], 1)
+        self.assertEqual(instrument.metrics.counters['bst_find_steps'], 2)
+        instrument.disable()
+        self.assertIs(WorkoutManager.add_exercise, original)
+
+    def test_same_recursion_depth(self):
+        # Counting BST steps must not make the recursion any deeper
+        instrument.enable()
+        m = WorkoutManager()
+        limit = sys.getrecursionlimit()
+        for i in range(limit - 100):
+            m.exercise_bst.insert(Exercise(f'Ex {i:05d}','Core',1,1,1,1))
+        self.assertGreater(instrument.metrics.counters['bst_insert_steps'], limit)
+
+    def test_dump_formats(self):
+        m = WorkoutManager()
+        m.add_exercise('Push-Up','Chest',3,12,10,3,'Strength')
+        instrument.metrics.observe('add_exercise', 0.5)
+        instrument.collect(m)
+        self.assertEqual(instrument.metrics.gauges['bst_height'], 1)
+        text = instrument.metrics.to_prometheus()
+        self.assertIn('fwt_operation_seconds_count{op="add_exercise"} 1', text)
+        self.assertIn('fwt_gauge{name="bst_size"} 1', text)
+        data = json.loads(instrument.metrics.to_json())
+        self.assertEqual(data['timers']['add_exercise']['max_seconds'], 0.5)
+
+class TestRoutineTemplates(unittest.TestCase):
+    def setUp(self):
+        self.m = WorkoutManager()
+        self.a = self.m.add_exercise('Push-Up','Chest',3,12,10,3,'Strength')
+        self.b = self.m.add_exercise('Squat','Legs',4,15,15,4,'Strength')
+        self.m.add_to_daily_routine(self.a)
+        self.m.add_to_daily_routine(self.b)
+        self.m.save_template('Leg Day')
+        self.m.clear_routine()
+
+    def test_load_shares_structure(self):
+        # Loading twice reuses the same cached node chain
+        self.m.load_template('leg day')
+        first = self.m.daily_routine.front
+        self.m.complete_next_exercise()
+        self.m.add_to_daily_routine(self.a)   # copy-on-write, template untouched
+        self.m.load_template('Leg Day')
+        self.assertIs(self.m.daily_routine.front, first)
+        self.assertEqual([e.name for e in self.m.get_routine_list()], ['Push-Up', 'Squat'])
+
+    def test_stats_follow_catalog(self):
+        # Cached totals refresh after the catalog changes
+        self.assertEqual(self.m.template_stats('Leg Day'), (25, 3.5))
+        self.m.edit_exercise('Squat', duration=20)
+        self.assertEqual(self.m.template_stats('Leg Day'), (30, 3.5))
+        self.m.delete_exercise('Push-Up')
+        self.m.load_template('Leg Day')
+        self.assertEqual([e.name for e in self.m.get_routine_list()], ['Squat'])
+
+    def test_carried_over_to_new_catalog(self):
+        # A template moved to a freshly loaded catalog must not reuse old nodes
+        self.m.load_template('Leg Day')
+        other = WorkoutManager()
+        other.add_exercise('Push-Up','Chest',3,12,20,3,'Strength')
+        other.add_exercise('Lunge','Legs',3,10,5,3,'Strength')
+        for template in self.m.templates.values():
+            other.add_template(template)
+        other.load_template('Leg Day')
+        routine = other.get_routine_list()
+        self.assertEqual([e.name for e in routine], ['Push-Up'])
+        self.assertEqual(routine[0].duration, 20)
+        self.assertIsNot(routine[0], self.a)
+
+    def test_follows_rename(self):
+        # Renaming (and undoing it) keeps the exercise in the template
+        self.m.edit_exercise('Squat', name='Air Squat')
+        self.m.load_template('Leg Day')
+        self.assertEqual([e.name for e in self.m.get_routine_list()], ['Push-Up', 'Air Squat'])
+        self.assertEqual(self.m.template_stats('Leg Day'), (25, 3.5))
+        self.m.undo()
+        self.m.undo()
+        self.assertEqual(self.m.get_template('Leg Day').exercise_names, ('Push-Up', 'Squat'))
+        self.m.redo()
+        self.assertEqual(self.m.get_template('Leg Day').exercise_names, ('Push-Up', 'Air Squat'))
+
+class TestShardedWorkoutManager(unittest.TestCase):
+    def setUp(self):
+        # Three worker processes, hash partitioned
+        self.m = ShardedWorkoutManager(num_shards=3)
+        self.addCleanup(self.m.close)
+        self.m.add_exercise('Push-Up','Chest',3,12,10,3,'Strength')
+        self.m.add_exercise('Squat','Legs',4,15,15,4,'Strength')
+        self.m.add_exercise('Jumping Jacks','Full Body',2,30,5,2,'Cardio')
+
+    def test_matches_single_manager(self):
+        # Scatter-gather results should look the same as one WorkoutManager
+        single = WorkoutManager()
+        for ex in self.m.get_all_exercises():
+            single.add_exercise(**ex.to_dict())
+        for key in (None, 'duration', 'difficulty'):
+            self.assertEqual([e.name for e in self.m.get_all_exercises(sort_key=key)],
+                             [e.name for e in single.get_all_exercises(sort_key=key)])
+
+    def test_point_operations(self):
+        # Duplicates are rejected by the owning shard
+        self.assertIsNone(self.m.add_exercise('squat','Legs',1,1,1,1))
+        self.assertEqual(self.m.find_by_name('SQUAT').name, 'Squat')
+        self.m.edit_exercise('Squat', name='Air Squat')
+        self.assertIsNone(self.m.find_by_name('Squat'))
+        self.assertEqual(self.m.find_by_name('Air Squat').sets, 4)
+        self.assertIsNotNone(self.m.delete_exercise('Push-Up'))
+        self.assertEqual(self.m.count(), 2)
+
+    def test_error_keeps_shards_in_sync(self):
+        # Every shard fails, the next calls must still get their own answers
+        with self.assertRaises(AttributeError):
+            self.m.get_all_exercises(sort_key='bogus')
+        self.assertEqual(self.m.find_by_name('Squat').name, 'Squat')
+        self.assertEqual(self.m.count(), 3)
+
+    def test_bulk_load_skips_bad_rows(self):
+        rows = [(f'A{i}','Chest',3,10,10,99 if i == 2 else 5) for i in range(1, 10)]
+        self.assertEqual(self.m.add_exercises(rows), 8)
+        self.assertIsNone(self.m.find_by_name('A2'))
+        for i in (1, 3, 4, 9):
+            self.assertEqual(self.m.find_by_name(f'A{i}').name, f'A{i}')
+
+    def test_limit(self):
+        full = [e.name for e in self.m.get_all_exercises(sort_key='duration')]
+        self.assertEqual([e.name for e in self.m.get_all_exercises(sort_key='duration', limit=2)],
+                         full[:2])
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,8 +1,16 @@
 # workout.py
 
+from itertools import count
 from exercise import Exercise
-from data_structures import ExerciseBST, ExerciseQueue
+from data_structures import ExerciseBST, ExerciseQueue, balanced_order
 from sort import insertion_sort
+from templates import RoutineTemplate
+from history import History
+from similarity import SimilarityIndex
+
+# Catalog versions come from one shared counter, so two managers never hand
+# out the same number (templates can move to a new manager on file load)
+_catalog_versions = count(1)
 
 class WorkoutManager:
     def __init__(self):
@@ -10,10 +18,31 @@ class WorkoutManager:
         self.exercise_bst = ExerciseBST()
         self.daily_routine = ExerciseQueue()
 
+        # Saved routine templates by lowercase name
+        self.templates = {}
+
+        # Changes on every catalog change so cached template data can be refreshed
+        self._version = next(_catalog_versions)
+
+        # Undo/redo records for catalog and routine changes
+        self.history = History()
+        self._replaying = False
+
+        # KD-tree index for "similar exercise" lookups, built on first use
+        self._similarity = None
+
+        # Callbacks told about every catalog change: fn(old_name, exercise or None)
+        self._listeners = []
+
     def add_exercise(self, name, muscle_group, sets, reps, duration, difficulty, category='General'):
         # Create new exercise and add it to BST
         ex = Exercise(name, muscle_group, sets, reps, duration, difficulty, category)
         inserted = self.exercise_bst.insert(ex)
+        if inserted:
+            self._version = next(_catalog_versions)
+            self._index_add(ex)
+            self._notify(ex.name, ex)
+            self._record(('add', ex))
         return ex if inserted else None
 
     def edit_exercise(self, original_name, **kwargs):
@@ -22,17 +51,70 @@ class WorkoutManager:
         if not ex:
             return None
 
+        # A new name must not clash with another exercise
+        new_name = kwargs.get('name')
+        renamed = bool(new_name) and new_name.strip().lower() != ex.name.lower()
+        if renamed and self.exercise_bst.find_by_name(new_name.strip()):
+            return None
+        before = ex.to_dict()
+        self._index_remove(ex.name)
+
+        # Renaming moves the node, so take it out of the tree first
+        if renamed:
+            self.exercise_bst.delete(ex.name)
+
         # Update allowed fields
         for k, v in kwargs.items():
             if hasattr(ex, k):
                 setattr(ex, k, v)
+
+        if renamed:
+            ex.name = ex.name.strip()
+            self.exercise_bst.insert(ex)
+            # Templates store names, so point them at the new one
+            # (undo/redo of the edit renames back through here too)
+            for template in self.templates.values():
+                template.rename_exercise(before['name'], ex.name)
+        self._index_add(ex)
+        self._version = next(_catalog_versions)
+        self._notify(before['name'], ex)
+        self._record(('edit', before, ex.to_dict()))
         return ex
 
     def delete_exercise(self, name):
         # Just call BST delete
         deleted = self.exercise_bst.delete(name)
+        if deleted:
+            self._version = next(_catalog_versions)
+            self._index_remove(deleted.name)
+            self._notify(deleted.name, None)
+            self._record(('delete', deleted))
         return deleted
 
+    def load_exercises(self, data):
+        # Add exercises from saved dicts, returns how many were added.
+        # Saved files are usually sorted by name, which would turn the BST
+        # into one long chain, so insert them middle-first instead.
+        rows = sorted((d for d in data if isinstance(d, dict) and isinstance(d.get('name'), str)),
+                      key=lambda d: d['name'].strip().lower())
+        added = 0
+        for d in balanced_order(rows):
+            try:
+                if self.add_exercise(
+                    d.get('name'),
+                    d.get('muscle_group','General'),
+                    d.get('sets',1),
+                    d.get('reps',1),
+                    int(d.get('duration',0)),
+                    int(d.get('difficulty',1)),
+                    d.get('category','General')
+                ):
+                    added += 1
+            except (ValueError, TypeError, AttributeError):
+                # Ignore invalid entries while loading
+                pass
+        return added
+
     def get_all_exercises(self, sort_key=None, category_filter=None, search=None):
         # Start with full list (already sorted alphabetically from BST)
         items = self.exercise_bst.in_order()
@@ -50,13 +132,48 @@ class WorkoutManager:
 
         return items
 
+    def find_similar(self, name, k=5):
+        # k closest substitutes for an exercise (closest first)
+        ex = self.exercise_bst.find_by_name(name)
+        if not ex:
+            return []
+        if self._similarity is None:
+            self._similarity = SimilarityIndex()
+            self._similarity.build(self.exercise_bst.in_order())
+        return self._similarity.nearest(ex, k)
+
+    def _index_add(self, ex):
+        # Keep the similarity index in sync (only once it exists)
+        if self._similarity is not None:
+            self._similarity.add(ex)
+
+    def _index_remove(self, name):
+        if self._similarity is not None:
+            self._similarity.remove(name)
+
+    def add_listener(self, fn):
+        # Register a callback for catalog changes (used by autosave)
+        self._listeners.append(fn)
+
+    def remove_listener(self, fn):
+        if fn in self._listeners:
+            self._listeners.remove(fn)
+
+    def _notify(self, old_name, exercise):
+        for fn in self._listeners:
+            fn(old_name, exercise)
+
     def add_to_daily_routine(self, exercise):
         # Queue keeps exercises in order for the day
         self.daily_routine.enqueue(exercise)
+        self._record(('enqueue', exercise))
 
     def complete_next_exercise(self):
         # Pop next exercise to perform
-        return self.daily_routine.dequeue()
+        ex = self.daily_routine.dequeue()
+        if ex:
+            self._record(('dequeue', ex))
+        return ex
 
     def get_routine_list(self):
         # Return the entire routine as list
@@ -64,4 +181,109 @@ class WorkoutManager:
 
     def clear_routine(self):
         # Reset queue
+        if self.daily_routine.is_empty():
+            return
+        before = self.daily_routine.snapshot()
         self.daily_routine.clear()
+        self._record(('clear', before))
+
+    # --- undo / redo ---
+
+    def undo(self):
+        # Revert the most recent change, returns the history record (or None)
+        entry = self.history.pop_undo()
+        if entry:
+            self._replay(entry, undo=True)
+        return entry
+
+    def redo(self):
+        # Apply the most recently undone change again
+        entry = self.history.pop_redo()
+        if entry:
+            self._replay(entry, undo=False)
+        return entry
+
+    def _record(self, entry):
+        # Skip recording while undo/redo itself is changing things
+        if not self._replaying:
+            self.history.record(entry)
+
+    def _replay(self, entry, undo):
+        self._replaying = True
+        try:
+            op = entry[0]
+            if op in ('add', 'delete'):
+                # Re-insert the same object so routines still point at it
+                ex = entry[1]
+                if (op == 'add') == undo:
+                    self.exercise_bst.delete(ex.name)
+                    self._index_remove(ex.name)
+                    self._notify(ex.name, None)
+                else:
+                    self.exercise_bst.insert(ex)
+                    self._index_add(ex)
+                    self._notify(ex.name, ex)
+                self._version = next(_catalog_versions)
+            elif op == 'edit':
+                old, new = (entry[2], entry[1]) if undo else (entry[1], entry[2])
+                self.edit_exercise(old['name'], **new)
+            elif op == 'enqueue':
+                if undo:
+                    self.daily_routine.pop_back()
+                else:
+                    self.daily_routine.enqueue(entry[1])
+            elif op == 'dequeue':
+                if undo:
+                    self.daily_routine.push_front(entry[1])
+                else:
+                    self.daily_routine.dequeue()
+            elif op in ('clear', 'template'):
+                if undo:
+                    # Put back the routine as it was before (shared nodes, O(1))
+                    self.daily_routine.share(*entry[1])
+                elif op == 'template':
+                    entry[2].instantiate(self.daily_routine, self.exercise_bst, self._version)
+                else:
+                    self.daily_routine.clear()
+        finally:
+            self._replaying = False
+
+    def save_template(self, name, exercises=None):
+        # Save a routine template (defaults to the current daily routine)
+        if exercises is None:
+            exercises = self.get_routine_list()
+        template = RoutineTemplate(name, [ex.name for ex in exercises])
+        self.templates[template.name.lower()] = template
+        return template
+
+    def add_template(self, template):
+        # Register an existing template (e.g. loaded from a file)
+        template.invalidate()
+        self.templates[template.name.lower()] = template
+
+    def get_template(self, name):
+        return self.templates.get(name.strip().lower()) if name else None
+
+    def delete_template(self, name):
+        return self.templates.pop(name.strip().lower(), None) if name else None
+
+    def get_template_names(self):
+        return sorted(t.name for t in self.templates.values())
+
+    def load_template(self, name):
+        # Replace today's routine with the template (O(1) when cached)
+        template = self.get_template(name)
+        if not template:
+            return None
+        before = self.daily_routine.snapshot()
+        template.instantiate(self.daily_routine, self.exercise_bst, self._version)
+        self._record(('template', before, template))
+        return template
+
+    def template_stats(self, name):
+        # Cached totals for a template: (total duration, average difficulty)
+        template = self.get_template(name)
+        if not template:
+            return None
+        return (template.total_duration(self.exercise_bst, self._version),
+                template.average_difficulty(self.exercise_bst, self._version))